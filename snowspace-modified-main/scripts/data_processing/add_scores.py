@@ -2,9 +2,9 @@
 Add traffic_score column to roads_circle_vertices.csv
 """
 
-import pandas as pd
 import numpy as np
-from traffic_scorer_simple import SimpleBramptonTrafficScorer
+import pyarrow.csv as pacsv
+from traffic_scorer_simple import get_default_scorer
 import time
 
 print("=" * 70)
@@ -12,27 +12,24 @@ print("Adding Traffic Scores to roads_circle_vertices.csv")
 print("=" * 70)
 print()
 
-# Initialize traffic scorer
-print("Initializing traffic scorer...")
-scorer = SimpleBramptonTrafficScorer()
-
-# Prepare data (build KDTree - this only happens ONCE!)
+# Initialize traffic scorer and prepare data
+# (build KDTree - this only happens ONCE per process!)
 print("Preparing traffic data (building spatial index)...")
 start_setup = time.time()
-scorer.prepare_data()
+scorer = get_default_scorer()
 setup_time = time.time() - start_setup
 print(f"✓ Setup complete in {setup_time:.2f} seconds")
 print()
 
 # Load CSV
 print("Loading CSV...")
-df = pd.read_csv("roads_circle_vertices.csv")
+df = pacsv.read_csv("roads_circle_vertices.csv").to_pandas(split_blocks=True, self_destruct=True)
 print(f"✓ Loaded {len(df):,} rows")
 print()
 
 # Score coordinates
 print("Scoring coordinates...")
-coordinates = list(zip(df['lon'], df['lat']))
+coordinates = df[['lon', 'lat']].to_numpy(dtype=np.float64, copy=False)
 
 start_scoring = time.time()
 scores = scorer.batch_score(coordinates)
@@ -1,89 +1,156 @@
 """
 Add traffic_score column to ontario_roads_vertices_wgs84.csv
-Processes the CSV in chunks for memory efficiency
+Processes the CSV in chunks for memory efficiency and writes Parquet (or CSV)
 """
 
-import pandas as pd
+import os
+import csv
 import numpy as np
-from traffic_scorer_simple import SimpleBramptonTrafficScorer
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from traffic_scorer_simple import get_default_scorer
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 def add_traffic_scores_to_csv(
     input_csv: str = "ontario_roads_vertices_wgs84.csv",
-    output_csv: str = "ontario_roads_vertices_wgs84_scored.csv",
-    chunk_size: int = 10000
+    output_path: str = "ontario_roads_vertices_wgs84_scored.parquet",
+    block_size: int = 1 << 20,
+    required_cols: Optional[List[str]] = None,
+    dtypes: Optional[dict] = None,
+    n_threads: int = 4,
+    output_format: str = 'parquet'
 ):
     """
     Add traffic_score column to CSV file.
 
     Args:
         input_csv: Path to input CSV file
-        output_csv: Path to output CSV file
-        chunk_size: Number of rows to process at once (for memory efficiency)
+        output_path: Path to output file
+        block_size: Bytes of CSV to parse and process at once (for memory efficiency)
+        required_cols: Columns to read and pass through to the output
+            (default all columns). Must include 'lon' and 'lat'.
+        dtypes: Column dtypes used when parsing (default float64 lon/lat, so
+            the coordinates are written out at full precision). All other
+            columns are read and written as text
+        n_threads: Number of chunks scored concurrently while the main
+            thread writes finished chunks in order
+        output_format: 'parquet' (zstd compressed) or 'csv'
     """
+    if output_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unknown output_format: {output_format!r} (expected 'parquet' or 'csv')")
+    if dtypes is None:
+        dtypes = {'lon': 'float64', 'lat': 'float64'}
 
     print("=" * 70)
     print("Adding Traffic Scores to CSV")
     print("=" * 70)
     print()
 
-    # Initialize traffic scorer
-    print("Initializing traffic scorer...")
-    scorer = SimpleBramptonTrafficScorer()
-
-    # Prepare data (build KDTree - this only happens ONCE!)
+    # Initialize traffic scorer and prepare data
+    # (build KDTree - this only happens ONCE per process!)
     print("Preparing traffic data (building spatial index)...")
     start_setup = time.time()
-    scorer.prepare_data()
+    scorer = get_default_scorer()
     setup_time = time.time() - start_setup
     print(f"✓ Setup complete in {setup_time:.2f} seconds")
     print()
 
-    # Get total number of rows for progress tracking
-    print(f"Counting rows in {input_csv}...")
-    total_rows = sum(1 for _ in open(input_csv)) - 1  # -1 for header
-    print(f"✓ Found {total_rows:,} rows to process")
-    print()
+    # Use file size for progress tracking (avoids a full pass to count rows)
+    total_bytes = os.path.getsize(input_csv)
 
     # Process CSV in chunks
     print("Processing CSV in chunks...")
-    print(f"Chunk size: {chunk_size:,} rows")
+    print(f"Block size: {block_size:,} bytes")
     print()
 
-    first_chunk = True
     rows_processed = 0
     start_scoring = time.time()
 
-    for chunk_idx, chunk in enumerate(pd.read_csv(input_csv, chunksize=chunk_size)):
-        chunk_start = time.time()
+    # Chunks are already scored in parallel, so split the cores between the
+    # pool threads rather than letting every KD-tree query use all of them
+    query_workers = max(1, (os.cpu_count() or 1) // n_threads)
 
+    def score_chunk(batch):
         # Get traffic scores for this chunk
-        coordinates = list(zip(chunk['lon'], chunk['lat']))
-        scores = scorer.batch_score(coordinates)
+        coordinates = np.column_stack((
+            batch.column('lon').to_numpy(zero_copy_only=False),
+            batch.column('lat').to_numpy(zero_copy_only=False)
+        ))
+        scores = scorer.batch_score(coordinates, workers=query_workers)
 
         # Add traffic_score column
-        chunk['traffic_score'] = scores
-
-        # Write to output CSV
-        mode = 'w' if first_chunk else 'a'
-        header = first_chunk
-        chunk.to_csv(output_csv, mode=mode, header=header, index=False)
-
-        rows_processed += len(chunk)
-        chunk_time = time.time() - chunk_start
-        rows_per_sec = len(chunk) / chunk_time
-
-        # Progress update
-        progress_pct = (rows_processed / total_rows) * 100
-        elapsed = time.time() - start_scoring
-        eta = (elapsed / rows_processed) * (total_rows - rows_processed)
-
-        print(f"Chunk {chunk_idx + 1}: {rows_processed:,}/{total_rows:,} rows "
-              f"({progress_pct:.1f}%) | "
-              f"{rows_per_sec:.0f} rows/sec | "
-              f"ETA: {eta:.0f}s")
-
-        first_chunk = False
+        return pa.RecordBatch.from_arrays(
+            batch.columns + [pa.array(scores)],
+            names=batch.schema.names + ['traffic_score']
+        )
+
+    def scored_chunks(reader, pool):
+        # Score chunks on worker threads (the KD-tree query releases the GIL)
+        # and yield them in input order. At most 2 chunks per thread are in
+        # flight, which bounds memory use.
+        pending = deque()
+        for batch in reader:
+            pending.append(pool.submit(score_chunk, batch))
+            if len(pending) >= 2 * n_threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    # Only lon/lat (and any explicit dtypes) are parsed. Every other column is
+    # passed through as text, because pyarrow infers types from the first
+    # block only and would fail partway through the file if a column
+    # changed type later (e.g. empty names, then 'Main St')
+    with open(input_csv, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f))
+    column_types = {col: pa.string() for col in header}
+    column_types.update({col: pa.from_numpy_dtype(np.dtype(t)) for col, t in dtypes.items()})
+
+    parquet_writer = None
+    fout = None
+    try:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            reader = pacsv.open_csv(
+                input_csv,
+                read_options=pacsv.ReadOptions(block_size=block_size),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=required_cols or [],
+                    column_types=column_types
+                )
+            )
+
+            for chunk_idx, batch in enumerate(scored_chunks(reader, pool)):
+                # Write to output (one writer / buffered handle for all chunks)
+                if output_format == 'parquet':
+                    if parquet_writer is None:
+                        parquet_writer = pq.ParquetWriter(output_path, batch.schema, compression='zstd')
+                    parquet_writer.write_batch(batch)
+                else:
+                    if fout is None:
+                        fout = open(output_path, 'w', buffering=1 << 20, newline='')
+                    batch.to_pandas().to_csv(fout, header=(chunk_idx == 0), index=False, lineterminator='\n')
+
+                rows_processed += batch.num_rows
+                elapsed = time.time() - start_scoring
+                rows_per_sec = rows_processed / elapsed
+
+                # Progress update (each batch is parsed from one block of the input)
+                bytes_read = min((chunk_idx + 1) * block_size, total_bytes)
+                progress_pct = (bytes_read / total_bytes) * 100
+                eta = (elapsed / bytes_read) * (total_bytes - bytes_read)
+
+                print(f"Chunk {chunk_idx + 1}: {rows_processed:,} rows "
+                      f"({progress_pct:.1f}%) | "
+                      f"{rows_per_sec:.0f} rows/sec | "
+                      f"ETA: {eta:.0f}s")
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+        if fout is not None:
+            fout.close()
 
     total_time = time.time() - start_scoring
 
@@ -98,7 +165,7 @@ def add_traffic_scores_to_csv(
     print(f"Average speed:   {rows_processed/total_time:.0f} rows/second")
     print(f"Time per row:    {total_time/rows_processed*1000:.2f} ms")
     print()
-    print(f"Output saved to: {output_csv}")
+    print(f"Output saved to: {output_path}")
     print("=" * 70)
 
 
@@ -108,7 +175,6 @@ def main():
     # Check if input file exists
     input_file = "ontario_roads_vertices_wgs84.csv"
 
-    import os
     if not os.path.exists(input_file):
         print(f"❌ Error: {input_file} not found!")
         return
@@ -116,15 +182,16 @@ def main():
     # Run the processing
     add_traffic_scores_to_csv(
         input_csv=input_file,
-        output_csv="ontario_roads_vertices_wgs84_scored.csv",
-        chunk_size=10000  # Adjust this if you have memory constraints
+        output_path="ontario_roads_vertices_wgs84_scored.parquet",
+        block_size=1 << 20  # Adjust this if you have memory constraints
     )
 
     # Show a sample of the results
     print()
     print("Sample of results:")
     print()
-    df_sample = pd.read_csv("ontario_roads_vertices_wgs84_scored.csv", nrows=10)
+    parquet_file = pq.ParquetFile("ontario_roads_vertices_wgs84_scored.parquet")
+    df_sample = next(parquet_file.iter_batches(batch_size=10)).to_pandas()
     print(df_sample)
 
 
@@ -2,7 +2,6 @@
 
 import ee
 import pandas as pd
-from datetime import datetime, timedelta
 
 def ndsi_points_to_csv(date_str):
     # ---------- CONFIG ----------
@@ -19,9 +18,9 @@ def ndsi_points_to_csv(date_str):
 
     # ---------- Helpers ----------
     def parse_window(day_str, pad_days):
-        day = datetime.strptime(day_str, '%Y-%m-%d')
-        start = (day - timedelta(days=pad_days)).strftime('%Y-%m-%d')
-        end   = (day + timedelta(days=pad_days+1)).strftime('%Y-%m-%d')
+        day = pd.Timestamp(day_str)
+        start = (day - pd.Timedelta(days=pad_days)).strftime('%Y-%m-%d')
+        end   = (day + pd.Timedelta(days=pad_days+1)).strftime('%Y-%m-%d')
         return start, end
 
     def mask_s2_clouds(img):
@@ -40,28 +39,25 @@ def ndsi_points_to_csv(date_str):
     # Optional thinning; keep every 10th. Remove/adjust as needed.
     df_sub = df.iloc[::10].reset_index(drop=False).rename(columns={'index':'row_id'})
 
-    features = []
-    for _, r in df_sub.iterrows():
-        lon = float(r['lon'])
-        lat = float(r['lat'])
-        geom = ee.Geometry.Point([lon, lat])
-
-        feat = (ee.Feature(geom.buffer(BUFFER_M))
-                .set({
-                    'row_id'       : int(r['row_id']),
-                    'seg_id'       : r.get('seg_id', ''),
-                    'vertex_seq'   : r.get('vertex_seq', ''),
-                    'traffic_score': float(r.get('traffic_score', 0.0)),
-                    'lon'          : lon,
-                    'lat'          : lat
-                }))
-        features.append(feat)
-
-    fc = ee.FeatureCollection(features)
+    for col, default in [('seg_id', ''), ('vertex_seq', ''), ('traffic_score', 0.0)]:
+        if col not in df_sub.columns:
+            df_sub[col] = default
+
+    # Send the points as one list of plain dicts and build the features server-side
+    records = df_sub[['row_id', 'seg_id', 'vertex_seq', 'traffic_score', 'lon', 'lat']].to_dict('records')
+
+    def to_feature(d):
+        d = ee.Dictionary(d)
+        geom = ee.Geometry.Point([d.get('lon'), d.get('lat')])
+        return ee.Feature(geom.buffer(BUFFER_M), d)
+
+    fc = ee.FeatureCollection(ee.List(records).map(to_feature))
 
     # ---------- Build image for the window ----------
     start, end = parse_window(date_str, WINDOW_DAYS)
-    aoi = fc.geometry().bounds(1)
+    lon_min, lat_min = df_sub[['lon', 'lat']].min()
+    lon_max, lat_max = df_sub[['lon', 'lat']].max()
+    aoi = ee.Geometry.Rectangle([lon_min, lat_min, lon_max, lat_max])
 
     ic = (ee.ImageCollection(S2_COLL)
           .filterBounds(aoi)
@@ -69,10 +65,11 @@ def ndsi_points_to_csv(date_str):
           .map(mask_s2_clouds)
           .map(add_ndsi))
 
-    img = ic.sort('CLOUDY_PIXEL_PERCENTAGE').first()
-    if img.getInfo() is None:
+    if ic.size().getInfo() == 0:
         raise RuntimeError(f'No Sentinel-2 image found {start}..{end} over the AOI.')
 
+    img = ic.sort('CLOUDY_PIXEL_PERCENTAGE').first()
+
     used_date = ee.Date(img.get('system:time_start')).format('YYYY-MM-dd')
 
     # ---------- Sample NDSI ----------
@@ -83,21 +80,15 @@ def ndsi_points_to_csv(date_str):
                      scale=10)
                  .map(lambda f: f.set({'used_image_date': used_date})))
 
-    records = sampled.getInfo()['features']
-    rows = []
-    for f in records:
-        p = f['properties']
-        rows.append({
-            'seg_id'        : p.get('seg_id'),
-            'vertex_seq'    : p.get('vertex_seq'),
-            'lon'           : p.get('lon'),
-            'lat'           : p.get('lat'),
-            'traffic_score' : p.get('traffic_score'),
-            'ndsi'          : p.get('mean'),
-            'used_image_date': p.get('used_image_date')
-        })
-
-    out = pd.DataFrame(rows)
+    # Fetch all sampled features as a DataFrame in one request
+    out = ee.data.computeFeatures({
+        'expression': sampled,
+        'fileFormat': 'PANDAS_DATAFRAME'
+    })
+    out = (out.rename(columns={'mean': 'ndsi'})
+              .reindex(columns=['seg_id', 'vertex_seq', 'lon', 'lat',
+                                'traffic_score', 'ndsi', 'used_image_date']))
+
     out.to_csv(CSV_OUT, index=False)
     print(f'Wrote {len(out)} rows to {CSV_OUT}')
 
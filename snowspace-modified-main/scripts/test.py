@@ -17,10 +17,9 @@ Edit:
 import sys
 import traceback
 import datetime as dt
-from collections import defaultdict
 
 import ee
-import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
 # ---------------- CONFIG ----------------
@@ -67,25 +66,23 @@ def err(msg):
 def weekly_mean(dates_str, values):
     """
     Bin dates/values into ISO (year, week) weekly means.
-    Returns: (list(datetime), list(float))
+    Returns: (DatetimeIndex, ndarray)
     """
-    bucket = defaultdict(list)
-    for d, v in zip(dates_str, values):
-        if v is None:
-            continue
-        try:
-            d0 = dt.datetime.strptime(d, "%Y-%m-%d").date()
-            iso = d0.isocalendar()  # (year, week, weekday)
-            bucket[(iso[0], iso[1])].append(float(v))
-        except Exception as e:
-            warn(f"Bad date/value pair: {d} / {v} ({e})")
-
-    out_dates, out_vals = [], []
-    for (y, w) in sorted(bucket.keys()):
-        # mid-week (Thu = 4) for plotting
-        out_dates.append(dt.datetime.fromisocalendar(y, w, 4))
-        out_vals.append(float(np.nanmean(bucket[(y, w)])))
-    return out_dates, out_vals
+    s = pd.Series(
+        pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(),
+        index=pd.to_datetime(pd.Index(dates_str, dtype=object), format="%Y-%m-%d",
+                             errors='coerce', cache=True)
+    )
+    if s.index.hasnans:
+        warn(f"Skipping {s.index.isna().sum()} unparseable dates")
+    s = s[s.index.notna()].dropna()
+
+    iso = s.index.isocalendar()
+    grouped = s.groupby([iso['year'].to_numpy(), iso['week'].to_numpy()]).mean().sort_index()
+
+    # mid-week (Thu = 4) for plotting
+    out_dates = pd.to_datetime([f"{y}-W{w:02d}-4" for y, w in grouped.index], format="%G-W%V-%u")
+    return out_dates, grouped.to_numpy()
 
 
 def init_ee(project_id):
@@ -138,9 +135,9 @@ def build_s2_timeseries(aoi, start_date, end_date):
 
     feats = s2.map(s2_feat).filter(ee.Filter.notNull(['NDSI']))
 
-    # Pull to client
-    dates = feats.aggregate_array('date').getInfo()
-    vals  = feats.aggregate_array('NDSI').getInfo()
+    # Pull both columns to client in one request
+    dates, vals = (feats.reduceColumns(ee.Reducer.toList().repeat(2), ['date', 'NDSI'])
+                   .get('list').getInfo())
 
     log(f"S2 observations (post-cloudmask): {len(dates)}")
     if len(dates) == 0:
@@ -199,8 +196,8 @@ def build_s1_timeseries(aoi, start_date, end_date):
 
     feats = s1_sind.map(s1_feat).filter(ee.Filter.notNull(['SIND']))
 
-    dates = feats.aggregate_array('date').getInfo()
-    vals  = feats.aggregate_array('SIND').getInfo()
+    dates, vals = (feats.reduceColumns(ee.Reducer.toList().repeat(2), ['date', 'SIND'])
+                   .get('list').getInfo())
 
     log(f"S1 observations: {len(dates)}")
     if len(dates) == 0:
@@ -5,12 +5,122 @@ This script tries multiple methods to download the data.
 If all fail, it provides clear instructions for manual download.
 """
 
+import asyncio
+import aiohttp
 import requests
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional, Tuple
 
+try:
+    import re2 as re  # linear-time matching, no backtracking on large pages
+except ImportError:
+    import re
 
-def try_download_traffic_data():
+# ArcGIS Feature Server endpoints linked from the GeoHub dataset page
+_ARCGIS_RE = re.compile(r'https://services\d*\.arcgis\.com/[^"\']+/FeatureServer/\d+')
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    If an event loop is already running in this thread (Jupyter, async
+    servers), asyncio.run would fail, so the coroutine runs on its own loop
+    in a worker thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+async def _fetch(session: aiohttp.ClientSession, attempt: dict) -> Tuple[dict, Optional[int], bytearray, Optional[Exception]]:
+    """
+    Stream one attempt into a bytearray and return (attempt, status code, raw body, error).
+
+    Request errors (timeouts, refused connections, ...) are returned rather
+    than raised, with a None status, so the caller can report which source
+    failed. Stops after the first chunk if a 200 body is clearly not a JSON
+    object (e.g. an HTML landing page), so bad sources fail without a full
+    download.
+    """
+    buffer = bytearray()
+    try:
+        async with session.get(attempt['url'], params=attempt.get('params')) as response:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                first_chunk = not buffer
+                buffer.extend(chunk)
+                if first_chunk and response.status == 200 and not buffer.lstrip().startswith(b'{'):
+                    break
+            return attempt, response.status, buffer, None
+    except Exception as e:
+        return attempt, None, buffer, e
+
+
+async def fetch_first_geojson(attempts: list, timeout: float = 30) -> Optional[Tuple[dict, bytearray, dict]]:
+    """
+    Request every attempt concurrently and return the first GeoJSON response.
+
+    Attempts are dicts with a 'url', optional 'params' and optional 'name'.
+    Once one succeeds the remaining requests are cancelled, so the worst case
+    is a single timeout rather than one per attempt.
+
+    Returns:
+        (attempt, raw bytes, parsed data) for the winning attempt, or None
+    """
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        tasks = [asyncio.create_task(_fetch(session, attempt)) for attempt in attempts]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                attempt, status, content, error = await next_done
+                label = attempt.get('name', attempt['url'])
+                if error is not None:
+                    print(f"✗ {label}: {error!r}")
+                    continue
+
+                if status != 200:
+                    print(f"✗ {label}: failed with status code {status}")
+                    # Try to show error message
+                    try:
+                        error_data = orjson.loads(content)
+                        if 'error' in error_data:
+                            print(f"  Error message: {error_data['error']}")
+                    except Exception:
+                        pass
+                    continue
+
+                # Check if it's valid JSON/GeoJSON
+                try:
+                    data = orjson.loads(content)
+                except orjson.JSONDecodeError:
+                    print(f"✗ {label}: response is not valid JSON")
+                    print(f"  Response preview: {bytes(content[:200])!r}...")
+                    continue
+
+                if isinstance(data, dict) and 'features' in data:
+                    print(f"✓ {label}: found {len(data['features'])} features")
+                    return attempt, content, data
+
+                print(f"✗ {label}: response is JSON but not GeoJSON format")
+                if isinstance(data, dict):
+                    print(f"  Keys found: {list(data.keys())}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return None
+
+
+async def try_download_traffic_data_async() -> bool:
     """Try multiple methods to download Brampton traffic data"""
 
     data_dir = Path("brampton_traffic_data")
@@ -47,56 +157,24 @@ def try_download_traffic_data():
         }
     ]
 
-    for i, attempt in enumerate(attempts, 1):
-        print(f"Attempt {i}/{len(attempts)}: {attempt['name']}")
-        print(f"URL: {attempt['url']}")
-
-        try:
-            params = attempt.get('params', None)
-            response = requests.get(attempt['url'], params=params, timeout=30)
-
-            print(f"Status Code: {response.status_code}")
-
-            if response.status_code == 200:
-                # Check if it's valid JSON/GeoJSON
-                try:
-                    data = response.json()
-
-                    # Check if it has features (GeoJSON format)
-                    if 'features' in data:
-                        print(f"✓ Success! Found {len(data['features'])} features")
-
-                        # Save to file
-                        output_file = data_dir / "brampton_traffic.geojson"
-                        with open(output_file, 'w') as f:
-                            json.dump(data, f)
-
-                        print(f"✓ Saved to: {output_file}")
-                        print(f"\nYou can now run: python traffic_scorer.py")
-                        return True
-                    else:
-                        print(f"✗ Response is JSON but not GeoJSON format")
-                        print(f"Keys found: {list(data.keys())}")
+    print(f"Trying {len(attempts)} sources concurrently:")
+    for attempt in attempts:
+        print(f"  - {attempt['name']}: {attempt['url']}")
+    print()
 
-                except json.JSONDecodeError:
-                    print(f"✗ Response is not valid JSON")
-                    print(f"Response preview: {response.text[:200]}...")
+    result = await fetch_first_geojson(attempts)
+    if result is not None:
+        _, content, _ = result
 
-            else:
-                print(f"✗ Failed with status code {response.status_code}")
+        # Save a byte-for-byte copy of the download
+        output_file = data_dir / "brampton_traffic.geojson"
+        output_file.write_bytes(content)
 
-                # Try to show error message
-                try:
-                    error_data = response.json()
-                    if 'error' in error_data:
-                        print(f"Error message: {error_data['error']}")
-                except:
-                    pass
+        print(f"✓ Saved to: {output_file}")
+        print(f"\nYou can now run: python traffic_scorer.py")
+        return True
 
-        except Exception as e:
-            print(f"✗ Error: {e}")
-
-        print()
+    print()
 
     # All attempts failed
     print("=" * 60)
@@ -126,12 +204,12 @@ def try_download_traffic_data():
         response = requests.get('https://geohub.brampton.ca/datasets/city-of-brampton-traffic-volumes', timeout=10)
         if response.status_code == 200:
             # Look for common download link patterns in the HTML
-            if 'download' in response.text.lower():
+            # (download links appear near the top, so only lowercase the start)
+            if 'download' in response.text[:10000].lower():
                 print("✓ Page accessible - download button should be available")
             if 'arcgis.com' in response.text:
                 # Try to extract the server URL
-                import re
-                servers = re.findall(r'https://services\d*\.arcgis\.com/[^"\']+/FeatureServer/\d+', response.text)
+                servers = _ARCGIS_RE.findall(response.text)
                 if servers:
                     print(f"\nFound potential API endpoints:")
                     for server in set(servers):
@@ -143,6 +221,11 @@ def try_download_traffic_data():
     return False
 
 
+def try_download_traffic_data() -> bool:
+    """Synchronous wrapper around try_download_traffic_data_async"""
+    return run_sync(try_download_traffic_data_async())
+
+
 if __name__ == "__main__":
     success = try_download_traffic_data()
 
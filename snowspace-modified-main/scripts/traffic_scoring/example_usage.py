@@ -37,12 +37,9 @@ def example_batch_scoring():
     import numpy as np
     np.random.seed(42)
 
-    # Generate coordinates within Brampton bounds
+    # Generate coordinates within Brampton bounds as an (N, 2) lon/lat array
     n_coords = 30000
-    coords = [
-        (np.random.uniform(-79.8, -79.6), np.random.uniform(43.6, 43.8))
-        for _ in range(n_coords)
-    ]
+    coords = np.random.uniform([-79.8, 43.6], [-79.6, 43.8], size=(n_coords, 2))
 
     # Score all coordinates
     print(f"Scoring {n_coords} coordinates...")
@@ -119,13 +116,13 @@ def example_custom_parameters():
     score_local = scorer.get_traffic_score(lon, lat, k=3)
 
     # Adjust maximum search distance
-    score_precise = scorer.get_traffic_score(lon, lat, max_distance=0.005)
+    score_precise = scorer.get_traffic_score(lon, lat, max_distance=500)
 
     print(f"Same location ({lon}, {lat}) with different parameters:")
     print(f"  Default (k=5):           {score_default:.3f}")
     print(f"  Smooth (k=10):           {score_smooth:.3f}")
     print(f"  Local (k=3):             {score_local:.3f}")
-    print(f"  Precise (max_dist=0.005): {score_precise:.3f}\n")
+    print(f"  Precise (max_dist=500m): {score_precise:.3f}\n")
 
 
 if __name__ == "__main__":